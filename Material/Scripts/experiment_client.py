@@ -12,8 +12,8 @@ from threading import Thread
 import thread
 import time
 
-if len(sys.argv) != 8:
-    print("Usage: ./experiment_client.py <serverIP> <monoORnet> <exe> <instance+setting+config dir> <repo dir> <output dir> <threadCount>")
+if len(sys.argv) != 8 and len(sys.argv) != 9:
+    print("Usage: ./experiment_client.py <serverIP> <monoORnet> <exe> <instance+setting+config dir> <repo dir> <output dir> <threadCount> [<port>]")
     sys.exit(1)
 
 # --> Logging
@@ -32,7 +32,7 @@ submitfinishedsignal = "2"
 sleepmodesignal = "3"
 executesignal = "4"
 socketcommunicationdelimiter = ';'
-port = 31353
+port = int(sys.argv[8]) if len(sys.argv) > 8 else 31353
 # Check operating system
 islinux = sys.platform == "linux" or sys.platform == "linux2"
 # Initialize connection
@@ -82,10 +82,12 @@ def workerthreadcall(state):
 			if message[0] == executesignal:
 				# Execute the next job
 				log("worker{0}: Received job: {1}".format(workerid, message))
-				instancepath = os.path.join(instanceconfigdir, os.path.normpath(message[3]))
-				settingpath = os.path.join(instanceconfigdir, os.path.normpath(message[4]))
-				configpath = os.path.join(instanceconfigdir, os.path.normpath(message[5]))
-				out_dir = os.path.join(outputdirectory, "worker{0}".format(workerid))
+				# Use the directories of the experiment (absolute or relative to the instance+setting+config dir), if the dispatcher serves several of them
+				instancepath = os.path.join(instanceconfigdir, os.path.normpath(message[8]) if len(message) > 10 else "", os.path.normpath(message[3]))
+				settingpath = os.path.join(instanceconfigdir, os.path.normpath(message[9]) if len(message) > 10 else "", os.path.normpath(message[4]))
+				configpath = os.path.join(instanceconfigdir, os.path.normpath(message[10]) if len(message) > 10 else "", os.path.normpath(message[5]))
+				# Use the output directory of the experiment, if the dispatcher serves several of them
+				out_dir = os.path.join(message[7] if len(message) > 7 else outputdirectory, "worker{0}".format(workerid))
 				seed = message[6]
 				call = "{0}{1} {2} {3} {4} {5} {6}".format("mono " if mono else "", os.path.normpath(exe), os.path.normpath(instancepath), os.path.normpath(settingpath), os.path.normpath(configpath), os.path.normpath(out_dir), seed)
 				process = subprocess.Popen(call, creationflags=subprocess.CREATE_NEW_CONSOLE)
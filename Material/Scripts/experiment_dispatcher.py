@@ -0,0 +1,255 @@
+#!/usr/bin/env python
+
+import datetime
+import glob
+import os
+import os.path
+import random
+import socket
+import sys
+import threading
+import time
+from itertools import count, product
+from threading import Thread
+
+if len(sys.argv) != 3 and len(sys.argv) != 4:
+    print("Usage: ./experiment_dispatcher.py <port> <worker timeout in hours> [<instance+setting+config root>]")
+    sys.exit(1)
+
+# ---> Define additional functions
+# --> Logging
+global logfilename
+logfilename = "experimentdispatcher.log"
+if os.path.isfile(logfilename):
+	os.remove(logfilename)
+def log(message):
+	timestampedmessage = "{0}: {1}".format(datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"), message)
+	print(timestampedmessage)
+	with open(logfilename, "a") as logfile:
+		logfile.write("{0}\n".format(timestampedmessage))
+# --> Path handling
+# Directories are registered as seen by the workers - relative ones are resolved against the root on the dispatcher and against the client's instance+setting+config dir on the workers
+def localpath(path):
+	return os.path.join(instanceconfigroot, os.path.normpath(path.replace("\\", "/")))
+# --> Experiment bookkeeping
+class Experiment:
+	def __init__(self, name, weight, instancedir, settingdir, configdir, outputdir):
+		self.name = name # the name of the experiment used for logging
+		self.weight = weight # the share of the worker pool this experiment is entitled to relative to the others
+		self.instancedir = instancedir # the directory containing the instances of this experiment (as seen by the workers)
+		self.settingdir = settingdir # the directory containing the settings of this experiment (as seen by the workers)
+		self.configdir = configdir # the directory containing the configurations of this experiment (as seen by the workers)
+		self.outputdir = outputdir # the output directory the workers write the results of this experiment to
+		self.jobidentstodo = {}
+		self.jobidentsinprogress = {}
+		self.jobidentsdone = {}
+		self.jobexecutiontimes = []
+		self.dispatched = 0
+		self.requestidents = set()
+		self.starttime = datetime.datetime.now()
+	def status(self):
+		return "{0}: {1}/{2}/{3} (done/inprogress/todo) todo-ETA (sum): {4}".format(self.name, len(self.jobidentsdone), len(self.jobidentsinprogress), len(self.jobidentstodo), "n/a" if len(self.jobexecutiontimes) == 0 else "{0}".format(sum(self.jobexecutiontimes, datetime.timedelta())/len(self.jobexecutiontimes)*len(self.jobidentstodo)))
+# Chooses the experiment to serve next by weighted fair share - the experiment using the smallest share of the workers relative to its weight is served first
+def chooseexperiment():
+	candidates = [e for e in experiments.values() if len(e.jobidentstodo) > 0]
+	if len(candidates) == 0:
+		return None
+	return min(candidates, key=lambda e: (len(e.jobidentsinprogress) / e.weight, e.dispatched / e.weight))
+# Drops all bookkeeping of a finished experiment - results still arriving for it are reported as unknown jobs
+def removeexperiment(experiment):
+	experiments.pop(experiment.name)
+	for jobident in experiment.jobidentsdone.keys():
+		experimentperjob.pop(jobident, None)
+		requstidentsperjob.pop(jobident, None)
+		lastrequestidentperjob.pop(jobident, None)
+	for requestident in experiment.requestidents:
+		requeststarttimes.pop(requestident, None)
+# Registers a new experiment by building its job list the same way experiment_main.py does
+def registerexperiment(name, weight, instancedir, settingdir, configdir, outputdir, firstseed, seedcount):
+	instancelisting = glob.glob(os.path.join(localpath(instancedir), "*.xinst")) + glob.glob(os.path.join(localpath(instancedir), "*.xlayo"))
+	settinglisting = glob.glob(os.path.join(localpath(settingdir), "*.xsett"))
+	configlisting = glob.glob(os.path.join(localpath(configdir), "*.xconf"))
+	seedlisting = range(firstseed, firstseed + seedcount)
+	experiment = Experiment(name, weight, instancedir, settingdir, configdir, outputdir)
+	for instance, setting, config, seed in product(instancelisting, settinglisting, configlisting, seedlisting):
+		# Idents are drawn from a counter - they stay unique over the whole lifetime of the dispatcher
+		jobident = next(jobidentcounter)
+		experimentperjob[jobident] = experiment
+		experiment.jobidentstodo[jobident] = (os.path.basename(instance), os.path.basename(setting), os.path.basename(config), seed)
+	if len(experiment.jobidentstodo) > 0:
+		experiments[name] = experiment
+	log("Registered experiment {0} with weight {1} and {2} jobs for {3} instances {4} settings {5} configs and {6} seeds".format(name, weight, len(experiment.jobidentstodo), len(instancelisting), len(settinglisting), len(configlisting), len(seedlisting)))
+	return experiment
+# --> Timeout monitoring
+lock = threading.Lock()
+def timeoutmonitor():
+	while not exitrequested:
+		# Acquire lock before accessing the lists
+		lock.acquire()
+		# See whether a run timed out
+		for experiment in experiments.values():
+			for jobident in list(experiment.jobidentsinprogress.keys()):
+				if datetime.datetime.now() - requeststarttimes[lastrequestidentperjob[jobident]] > runtimeout:
+					log("Job of experiment {0} timed out: {1}".format(experiment.name, jobident))
+					experiment.jobidentstodo[jobident] = experiment.jobidentsinprogress.pop(jobident)
+		# Release lock for the lists
+		lock.release()
+		# Sleep before checking the next time
+		time.sleep(60)
+
+log(">>> Starting experiment dispatcher")
+
+# Set some values
+requestjobsignal = "1"
+submitfinishedsignal = "2"
+sleepmodesignal = "3"
+executesignal = "4"
+registersignal = "5"
+registeredsignal = "6"
+socketcommunicationdelimiter = ';'
+port = int(sys.argv[1]) # the port to listen on for workers and registrations
+runtimeout = datetime.timedelta(hours=float(sys.argv[2])) # the timeout per job after which it is handed to another worker
+instanceconfigroot = sys.argv[3] if len(sys.argv) > 3 else "." # the directory relative instance, setting and config dirs are resolved against on this host
+
+# Seed random value generation
+random.seed(1)
+
+# Prepare the bookkeeping shared by all experiments
+global exitrequested
+exitrequested = False
+experiments = {}
+experimentperjob = {}
+jobidentcounter = count()
+requestidentcounter = count()
+requstidentsperjob = {}
+lastrequestidentperjob = {}
+requeststarttimes = {}
+
+# Start thread managing the timeouts
+timeoutmanager = Thread(target=timeoutmonitor)
+timeoutmanager.daemon = True
+timeoutmanager.start()
+
+# Host the server
+s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+host = ""
+s.bind((host, port))
+s.listen(5)
+log("Waiting for clients and experiments on port {0} ...".format(port))
+# Keep responding to worker bees and registrations until stopped
+try:
+	while True:
+		# Accept the request
+		c, addr = s.accept()
+		rawmessage = ""
+		message = [""]
+		# Synchronize before changing the lists
+		lock.acquire()
+		try:
+			# Analyze the message
+			rawmessage = c.recv(4096).decode()
+			log("rcvd: {0}".format(rawmessage))
+			message = rawmessage.split(socketcommunicationdelimiter)
+			# Respond to message
+			if message[0] == requestjobsignal:
+				experiment = chooseexperiment()
+				if experiment is not None:
+					# We have more jobs to do - send the next job of the experiment with the smallest share
+					log("Worker bee at {0} is requesting a new job - serving experiment {1} ...".format(addr, experiment.name))
+					jobident = random.choice(list(experiment.jobidentstodo.keys()))
+					requestident = next(requestidentcounter)
+					experiment.requestidents.add(requestident)
+					if jobident not in requstidentsperjob:
+						requstidentsperjob[jobident] = requestident
+					lastrequestidentperjob[jobident] = requestident
+					job = experiment.jobidentstodo[jobident]
+					jobdescription = socketcommunicationdelimiter.join(str(e) for e in (executesignal,requestident,jobident,job[0],job[1],job[2],job[3],experiment.outputdir,experiment.instancedir,experiment.settingdir,experiment.configdir))
+					experiment.jobidentsinprogress[jobident] = experiment.jobidentstodo.pop(jobident)
+					experiment.dispatched += 1
+					requeststarttimes[requestident] = datetime.datetime.now()
+					log("Sending job: {0}".format(jobdescription))
+					c.send(jobdescription.encode())
+				else:
+					# We are currently out of jobs - send the sleep command
+					log("No more jobs to send - setting worker bee at {0} to sleep ...".format(addr))
+					c.send(sleepmodesignal.encode())
+			elif message[0] == submitfinishedsignal:
+				jobident = int(message[2])
+				requestident = int(message[1])
+				experiment = experimentperjob.get(jobident)
+				if experiment is None:
+					# Job of an experiment that was already completed and removed
+					log("Warning! Received result for unknown job with ID: {0}".format(jobident))
+				elif jobident in experiment.jobidentsinprogress:
+					# Worker finished a job - keep the todo lists up to date
+					log("Finished job of experiment {0} with ID: {1}".format(experiment.name, jobident))
+					jobstarttime = requeststarttimes.pop(requestident)
+					experiment.jobidentsdone[jobident] = experiment.jobidentsinprogress.pop(jobident)
+					experiment.jobexecutiontimes.append(datetime.datetime.now() - jobstarttime)
+				elif requestident not in requeststarttimes:
+					# The result of this request was already recorded
+					log("Warning! Received duplicate result for job of experiment {0} with ID: {1}".format(experiment.name, jobident))
+				else:
+					# Worker returned after being considered as timed out - update the timeout value and cleanup
+					log("Finished job of experiment {0} with following ID after timeout: {1}".format(experiment.name, jobident))
+					jobstarttime = requeststarttimes.pop(requestident)
+					if jobident in experiment.jobidentstodo:
+						experiment.jobidentsdone[jobident] = experiment.jobidentstodo.pop(jobident)
+					newtimeout = datetime.datetime.now() - jobstarttime
+					experiment.jobexecutiontimes.append(newtimeout)
+					# Update the timeout if necessary
+					if newtimeout > runtimeout:
+						log("Set new timeout to {0} (was {1})".format(newtimeout, runtimeout))
+						runtimeout = newtimeout
+					if requestident == requstidentsperjob[jobident]:
+						# We seem to have submitted a job twice due to a timeout
+						log("Warning! Following job was executed more than once: {0}".format(experiment.jobidentsdone.get(jobident)))
+				# Remove the experiment as soon as all of its jobs are done
+				if experiment is not None and len(experiment.jobidentstodo) == 0 and len(experiment.jobidentsinprogress) == 0 and experiments.get(experiment.name) is experiment:
+					log("Experiment {0} finished after {1}".format(experiment.name, datetime.datetime.now() - experiment.starttime))
+					removeexperiment(experiment)
+			elif message[0] == registersignal:
+				# A new experiment is registered
+				if len(message) != 9 or not 0 < float(message[2]) < float("inf"):
+					log("Warning! Rejecting malformed registration: {0}".format(rawmessage))
+					c.send(socketcommunicationdelimiter.join((registeredsignal, "0")).encode())
+				elif message[1] in experiments:
+					log("Warning! Rejecting experiment {0} - an experiment with this name is still running".format(message[1]))
+					c.send(socketcommunicationdelimiter.join((registeredsignal, "0")).encode())
+				else:
+					# Parse all values before registering anything, so a malformed registration leaves no partial experiment behind
+					weight = float(message[2])
+					firstseed = int(message[7])
+					seedcount = int(message[8])
+					experiment = registerexperiment(message[1], weight, message[3], message[4], message[5], message[6], firstseed, seedcount)
+					c.send(socketcommunicationdelimiter.join((registeredsignal, str(len(experiment.jobidentstodo)))).encode())
+			else:
+				# Unknown signal
+				log("Warning! Unknown message received: {0}".format(rawmessage))
+		except (ValueError, IndexError, KeyError):
+			# Malformed message (including undecodable ones) - never let it take down the dispatcher and all experiments served by it
+			log("Warning! Malformed message received from {0}: {1}".format(addr, repr(rawmessage)))
+			if message[0] == registersignal:
+				try:
+					c.send(socketcommunicationdelimiter.join((registeredsignal, "0")).encode())
+				except socket.error as ex:
+					log("Warning! Could not answer {0}: {1}".format(addr, ex))
+		except socket.error as ex:
+			# The connection broke while talking to the client - a job sent in vain is handed out again after the timeout
+			log("Warning! Connection to {0} failed: {1}".format(addr, ex))
+		finally:
+			c.close()
+			# Log some info
+			for experiment in sorted(experiments.values(), key=lambda e: e.name):
+				log("Job status of {0}".format(experiment.status()))
+			# Release the lock after changing the lists
+			lock.release()
+except KeyboardInterrupt:
+	log("Stop requested ...")
+
+# Terminate
+s.close()
+exitrequested = True
+
+# Finish
+log(".Fin.")
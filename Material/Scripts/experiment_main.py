@@ -2,7 +2,9 @@
 
 import datetime
 import distutils.dir_util
+import experiment_preflight
 import glob
+import multiprocessing
 import os
 import os.path
 import random
@@ -32,6 +34,10 @@ global joblistcallhandlerfilename
 joblistcallhandlerfilename = "listjobcallhandler.py"
 global relayscriptname
 relayscriptname = "relay.sh"
+global preflightscriptname
+preflightscriptname = os.path.join(os.path.dirname(os.path.abspath(__file__)), "experiment_preflight.py")
+global preflightcachefilename
+preflightcachefilename = "preflightcache.json"
 # --> Logging
 global logfilename
 logfilename = "experiment.log"
@@ -268,6 +274,15 @@ configListing = [os.path.abspath(path) for path in glob.glob(config_filter)]
 # Build a list of seeds to use
 seedListing = xrange(firstSeed, firstSeed + seedCount)
 
+# Parse and validate all input files once before submitting anything (runs in a separate process to keep the pool away from this script)
+log("Running pre-flight check of all input files ...")
+if subprocess.call([sys.executable, preflightscriptname, sys.argv[4], sys.argv[5], sys.argv[6], resourcedir, preflightcachefilename, str(multiprocessing.cpu_count())]) != 0:
+	log("Pre-flight check failed - see {0} for details".format(experiment_preflight.logfilename))
+	sys.exit(1)
+preflightresults = dict((path, entry["result"]) for path, entry in experiment_preflight.loadcache(preflightcachefilename).items())
+estimatedcost = sum(experiment_preflight.estimatecost(preflightresults[instance], preflightresults[setting]) for instance in instanceListing for setting in settingListing) * len(configListing) * len(seedListing)
+log("Pre-flight check succeeded - estimated simulated bot-hours: {0:.1f}".format(estimatedcost / 3600.0))
+
 # Build the list of jobs
 instanceConfigSeedListing = []
 for job in product(instanceListing, settingListing, configListing, seedListing):
@@ -0,0 +1,283 @@
+#!/usr/bin/env python
+
+import datetime
+import glob
+import hashlib
+import json
+import multiprocessing
+import os
+import os.path
+import sys
+import xml.etree.ElementTree as ElementTree
+
+# ---> Define additional functions
+# --> Some global fields
+global xsitype
+xsitype = "{http://www.w3.org/2001/XMLSchema-instance}type"
+global cacheversion
+cacheversion = 1
+# The root element expected for every kind of input file
+global rootelements
+rootelements = {
+	".xinst": "Instance",
+	".xlayo": "LayoutConfiguration",
+	".xsett": "SettingConfiguration",
+	".xconf": "ControlConfiguration",
+}
+# The sub directories searched for resource files (mirrors IOConstants.DEFAULT_RESOURCE_SUB_DIRS)
+global resourcesubdirs
+resourcesubdirs = ["", "Resources", "Wordlists", "resources", "wordlists", os.path.join("Material", "Resources"), os.path.join("Material", "Resources", "Wordlists"), os.path.join("Resources", "Wordlists")]
+# The elements of a setting referring to a resource file
+global resourceelements
+resourceelements = ["GeneratorConfigFile", "WordFile", "OrderFile"]
+# --> Logging
+global logfilename
+logfilename = "experimentpreflight.log"
+def log(message):
+	timestampedmessage = "{0}: {1}".format(datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"), message)
+	print(timestampedmessage)
+	with open(logfilename, "a") as logfile:
+		logfile.write("{0}\n".format(timestampedmessage))
+# --> Input file listing (same filters as used by experiment_main.py)
+def listinputfiles(instancedir, settingdir, configdir):
+	instances = [os.path.abspath(path) for path in (glob.glob(os.path.join(instancedir, "*.xinst")) + glob.glob(os.path.join(instancedir, "*.xlayo")))]
+	settings = [os.path.abspath(path) for path in glob.glob(os.path.join(settingdir, "*.xsett"))]
+	configs = [os.path.abspath(path) for path in glob.glob(os.path.join(configdir, "*.xconf"))]
+	return (instances, settings, configs)
+# --> Resource lookup (mirrors IOHelper.FindResourceFile without the working dir)
+def findresourcefile(resourcefile, basedirs):
+	filename = os.path.basename(resourcefile.replace("\\", "/"))
+	for basedir in basedirs:
+		for subdir in resourcesubdirs:
+			path = os.path.join(basedir, subdir, filename)
+			if os.path.isfile(path):
+				return os.path.abspath(path)
+	return None
+# --> Cache handling
+def getmtime(path):
+	return os.path.getmtime(path) if os.path.isfile(path) else None
+def gethash(path):
+	sha = hashlib.sha1()
+	with open(path, "rb") as fp:
+		for block in iter(lambda: fp.read(1 << 20), b""):
+			sha.update(block)
+	return sha.hexdigest()
+def depsunchanged(entry):
+	return all(getmtime(path) == mtime for path, mtime in entry["deps"].items())
+def iscachehit(entry, path):
+	if entry is None:
+		return False
+	stat = os.stat(path)
+	return entry["mtime"] == stat.st_mtime and entry["size"] == stat.st_size and depsunchanged(entry)
+def loadcache(cachefile):
+	if not os.path.isfile(cachefile):
+		return {}
+	try:
+		with open(cachefile, "r") as fp:
+			cache = json.load(fp)
+	except ValueError:
+		return {}
+	return cache["entries"] if cache.get("version") == cacheversion else {}
+def savecache(cachefile, entries):
+	# Write to a temporary file first to never leave a truncated cache behind
+	tmpfile = "{0}.{1}.tmp".format(cachefile, os.getpid())
+	with open(tmpfile, "w") as fp:
+		json.dump({"version": cacheversion, "entries": entries}, fp)
+	if os.path.isfile(cachefile):
+		os.remove(cachefile)
+	os.rename(tmpfile, cachefile)
+# --> Parsing
+def gettext(root, tag, default=None):
+	element = root.find(tag)
+	return element.text if element is not None and element.text is not None else default
+def getnumber(root, tag):
+	text = gettext(root, tag)
+	return float(text) if text is not None else None
+def countelements(path, tags):
+	# Stream through the file, because instances easily contain tens of thousands of waypoints
+	counts = dict((tag, 0) for tag in tags)
+	rootname = None
+	rootattributes = None
+	for event, element in ElementTree.iterparse(path, events=("start", "end")):
+		if event == "start":
+			if rootname is None:
+				rootname = element.tag
+				rootattributes = dict(element.attrib)
+		else:
+			if element.tag in counts:
+				counts[element.tag] += 1
+			element.clear()
+	return (rootname, rootattributes, counts)
+def parseinstance(path, result):
+	rootname, attributes, counts = countelements(path, ["Tier", "Bot", "Pod", "InputStation", "OutputStation", "Waypoint"])
+	result["root"] = rootname
+	result["name"] = attributes.get("Name")
+	result["features"] = {
+		"tiers": counts["Tier"],
+		"bots": counts["Bot"],
+		"stations": counts["InputStation"] + counts["OutputStation"],
+		"pods": counts["Pod"],
+		"waypoints": counts["Waypoint"],
+	}
+def parselayout(path, result):
+	root = ElementTree.parse(path).getroot()
+	result["root"] = root.tag
+	result["name"] = gettext(root, "NameLayout")
+	tiers = getnumber(root, "TierCount")
+	stations = sum(getnumber(root, "{0}{1}".format(kind, side)) or 0 for kind in ["NPickStation", "NReplenishmentStation"] for side in ["West", "East", "South", "North"])
+	result["features"] = {
+		"tiers": int(tiers) if tiers is not None else None,
+		"bots": int(getnumber(root, "BotCount") or 0),
+		"stations": int(stations),
+		# Layouts only define the fraction of storage locations to fill - the pods are generated at runtime
+		"pods": None,
+		"podamount": getnumber(root, "PodAmount"),
+	}
+def parsesetting(path, resourcedir, result):
+	root = ElementTree.parse(path).getroot()
+	result["root"] = root.tag
+	result["name"] = gettext(root, "Name")
+	inventory = root.find("InventoryConfiguration")
+	features = {
+		"duration": getnumber(root, "SimulationDuration"),
+		"warmup": getnumber(root, "SimulationWarmupTime"),
+		"itemtype": None,
+		"orders": None,
+		"bundles": None,
+		"items": None,
+	}
+	resources = {}
+	if inventory is not None:
+		features["itemtype"] = gettext(inventory, "ItemType")
+		demand = inventory.find("DemandInventoryConfiguration")
+		if demand is not None:
+			features["orders"] = getnumber(demand, "OrderCount")
+			features["bundles"] = getnumber(demand, "BundleCount")
+		for element in inventory.iter():
+			if element.tag in resourceelements and element.text is not None and element.text.strip() != "":
+				resources[element.tag] = element.text.strip()
+	# Resolve the resources in the resource dir (copied to the working dir) - the remaining ones are checked per instance later on
+	resolved = {}
+	for tag, resourcefile in resources.items():
+		resolved[tag] = findresourcefile(resourcefile, [resourcedir])
+		candidate = os.path.join(resourcedir, os.path.basename(resourcefile.replace("\\", "/")))
+		result["deps"][candidate] = getmtime(candidate)
+		if resolved[tag] is not None:
+			result["deps"][resolved[tag]] = getmtime(resolved[tag])
+	if resolved.get("GeneratorConfigFile") is not None:
+		itemdescriptions = ElementTree.parse(resolved["GeneratorConfigFile"]).getroot().find("ItemDescriptions")
+		features["items"] = len(list(itemdescriptions)) if itemdescriptions is not None else None
+	elif resolved.get("WordFile") is not None:
+		with open(resolved["WordFile"], "r") as fp:
+			features["items"] = len([line for line in fp if line.strip() != ""])
+	result["features"] = features
+	result["resources"] = resources
+	result["resolved"] = resolved
+def parseconfig(path, result):
+	root = ElementTree.parse(path).getroot()
+	result["root"] = root.tag
+	result["name"] = gettext(root, "Name")
+	# Remember the controller types, e.g. the path planner, as they dominate the runtime
+	result["features"] = dict((element.tag, element.get(xsitype)) for element in root if element.get(xsitype) is not None)
+# Parses one input file, if it is not covered by the cache entry anymore
+def parseinputfile(arg):
+	path = arg[0]
+	entry = arg[1]
+	resourcedir = arg[2]
+	stat = os.stat(path)
+	filehash = gethash(path)
+	if entry is not None and entry["sha1"] == filehash and depsunchanged(entry):
+		# Only the timestamp changed (e.g. fresh checkout) - keep the parsed result
+		entry["mtime"] = stat.st_mtime
+		entry["size"] = stat.st_size
+		return (path, entry, False)
+	extension = os.path.splitext(path)[1]
+	result = {"path": path, "kind": extension, "root": None, "name": None, "features": {}, "deps": {}, "errors": []}
+	try:
+		if extension == ".xinst":
+			parseinstance(path, result)
+		elif extension == ".xlayo":
+			parselayout(path, result)
+		elif extension == ".xsett":
+			parsesetting(path, resourcedir, result)
+		elif extension == ".xconf":
+			parseconfig(path, result)
+		if result["root"] != rootelements[extension]:
+			result["errors"].append("Expected root element {0} but found {1}".format(rootelements[extension], result["root"]))
+		if result["name"] is None or result["name"].strip() == "":
+			result["errors"].append("Missing name")
+	except Exception as ex:
+		result["errors"].append("Could not parse file: {0}".format(ex))
+	return (path, {"mtime": stat.st_mtime, "size": stat.st_size, "sha1": filehash, "deps": result.pop("deps"), "result": result}, True)
+# --> Validation of the combinations
+def validatecombinations(instances, settings, configs):
+	errors = []
+	# Every setting resource not found in the resource dir has to be found from the instance's location
+	for setting in settings:
+		for tag, resourcefile in setting.get("resources", {}).items():
+			if setting["resolved"][tag] is None:
+				for instance in instances:
+					if findresourcefile(resourcefile, [os.path.dirname(instance["path"])]) is None:
+						errors.append("Cannot find {0} {1} of {2} for {3}".format(tag, resourcefile, os.path.basename(setting["path"]), os.path.basename(instance["path"])))
+	# The statistics directory of a run is named by instance, setting and config - any collision makes runs overwrite each other
+	statisticsfolders = {}
+	for instance in instances:
+		for setting in settings:
+			for config in configs:
+				folder = "-".join([instance["name"], setting["name"], config["name"]])
+				files = (os.path.basename(instance["path"]), os.path.basename(setting["path"]), os.path.basename(config["path"]))
+				if folder in statisticsfolders:
+					errors.append("Runs {0} and {1} would both write to statistics folder {2}".format(",".join(statisticsfolders[folder]), ",".join(files), folder))
+				else:
+					statisticsfolders[folder] = files
+	return errors
+# --> Cost estimation
+def estimatecost(instance, setting):
+	# Simulated bot-seconds are the main driver of a run's runtime
+	bots = instance["features"].get("bots") or 0
+	duration = (setting["features"].get("duration") or 0) + (setting["features"].get("warmup") or 0)
+	return bots * duration
+# --> Pre-flight check of all input files - returns the parsed files and all errors found
+def preflight(instancedir, settingdir, configdir, resourcedir, cachefile, processcount):
+	instancepaths, settingpaths, configpaths = listinputfiles(instancedir, settingdir, configdir)
+	paths = instancepaths + settingpaths + configpaths
+	entries = loadcache(cachefile)
+	# Only files not covered by the cache are handed to the pool
+	todo = [path for path in paths if not iscachehit(entries.get(path), path)]
+	log("Found {0} input files ({1} taken from cache)".format(len(paths), len(paths) - len(todo)))
+	if len(todo) > 0:
+		pool = multiprocessing.Pool(processcount)
+		parsed = pool.map(parseinputfile, [(path, entries.get(path), os.path.abspath(resourcedir)) for path in todo])
+		pool.close()
+		pool.join()
+		log("Parsed {0} input files".format(len([p for p in parsed if p[2]])))
+		for path, entry, reparsed in parsed:
+			entries[path] = entry
+		savecache(cachefile, entries)
+	results = dict((path, entries[path]["result"]) for path in paths)
+	errors = ["{0}: {1}".format(path, error) for path in paths for error in results[path]["errors"]]
+	# Files that could not be parsed are already reported - only combine the valid ones
+	valid = lambda selection: [results[path] for path in selection if len(results[path]["errors"]) == 0]
+	errors += validatecombinations(valid(instancepaths), valid(settingpaths), valid(configpaths))
+	return (results, errors)
+
+if __name__ == "__main__":
+	if len(sys.argv) != 7:
+		print("Usage: ./experiment_preflight.py <instance dir> <setting dir> <config dir> <resource dir> <cache file> <processCount>")
+		sys.exit(1)
+
+	if os.path.isfile(logfilename):
+		os.remove(logfilename)
+	log(">>> Starting pre-flight check")
+
+	# Parse and validate
+	results, errors = preflight(sys.argv[1], sys.argv[2], sys.argv[3], sys.argv[4], sys.argv[5], int(sys.argv[6]))
+	for path in sorted(results.keys()):
+		log("{0}: {1}".format(os.path.basename(path), ",".join("{0}={1}".format(k, v) for k, v in sorted(results[path]["features"].items()))))
+	for error in errors:
+		log("Error: {0}".format(error))
+
+	# Finish
+	log("Pre-flight check {0} with {1} errors".format("failed" if len(errors) > 0 else "succeeded", len(errors)))
+	log(".Fin.")
+	sys.exit(1 if len(errors) > 0 else 0)
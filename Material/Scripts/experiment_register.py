@@ -0,0 +1,48 @@
+#!/usr/bin/env python
+
+import socket
+import sys
+
+if len(sys.argv) != 11:
+    print("Usage: ./experiment_register.py <dispatcherIP> <port> <name> <weight> <instance dir> <setting dir> <config dir> <output dir> <firstSeed> <seedCount>")
+    sys.exit(1)
+
+# Set some constant values
+registersignal = "5"
+registeredsignal = "6"
+socketcommunicationdelimiter = ';'
+
+# Get input information
+host = sys.argv[1] # the host running experiment_dispatcher.py
+port = int(sys.argv[2]) # the port the dispatcher listens on
+name = sys.argv[3] # the name of the experiment (has to be unique among the running experiments)
+weight = float(sys.argv[4]) # the share of the worker pool this experiment is entitled to relative to the others
+# The directories are passed on unchanged and normalized where they are used:
+# - instance, setting and config dir: listed by the dispatcher and read by the workers - use paths relative to the dispatcher's root and the clients' instance+setting+config dir or absolute paths valid on all hosts
+# - output dir: only used by the workers - has to be valid on every worker host
+directories = sys.argv[5:9] # the instance, setting, config and output directory
+firstSeed = int(sys.argv[9]) # the first seed to start with
+seedCount = int(sys.argv[10]) # the number of seeds to run
+if not 0 < weight < float("inf"):
+	print("Weight has to be a finite positive number: {0}".format(weight))
+	sys.exit(1)
+if any(socketcommunicationdelimiter in e for e in [name] + directories):
+	print("Name and directories must not contain the delimiter: {0}".format(socketcommunicationdelimiter))
+	sys.exit(1)
+
+# Register the experiment
+print("Registering experiment {0} with weight {1} at {2}:{3} ...".format(name, weight, host, port))
+sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+sock.connect((host, port))
+sock.send(socketcommunicationdelimiter.join(str(e) for e in [registersignal, name, weight] + directories + [firstSeed, seedCount]).encode())
+message = sock.recv(1024).decode().split(socketcommunicationdelimiter)
+sock.close()
+
+# Check the response
+if message[0] != registeredsignal or int(message[1]) == 0:
+	print("Registration failed - the experiment has no jobs, a malformed registration was sent or an experiment with this name is still running")
+	sys.exit(1)
+print("Registered experiment {0} with {1} jobs".format(name, message[1]))
+
+# Finish
+print(".Fin.")
@@ -0,0 +1,307 @@
+#!/usr/bin/env python
+
+import datetime
+import glob
+import hashlib
+import json
+import multiprocessing
+import os
+import os.path
+import sys
+
+import numpy
+
+# ---> Define additional functions
+# --> Some global fields
+global heatcommentline
+heatcommentline = "#"
+global heattagstart
+heattagstart = "<"
+global heattagend
+heattagend = ">:"
+global heatdelimiter
+heatdelimiter = ";"
+global cachefileextension
+cachefileextension = ".npy"
+global stackfileextension
+stackfileextension = ".stack"
+global cacheindexfilename
+cacheindexfilename = "cacheindex.json"
+# --> Heat data types (mirrors HeatDataType and the sub data choices of the heatmap renderer)
+# Every type maps to the columns to read (tier, x, y, values ...) and the names of the values
+global heatdatatypes
+heatdatatypes = {
+	"PolledLocation": ((1, 2, 3), ["Seen"]),
+	"TimeIndependentTripData": ((0, 1, 2, 3, 4, 5, 6, 7), ["Overall", "FromOStation", "ToOStation", "FromIStation", "ToIStation"]),
+	"StorageLocationInfo": ((1, 2, 3, 4, 5, 6), ["Speed", "Utility", "Combined"]),
+}
+# --> Logging
+global logfilename
+logfilename = "heataggregator.log"
+def log(message):
+	timestampedmessage = "{0}: {1}".format(datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"), message)
+	print(timestampedmessage)
+	with open(logfilename, "a") as logfile:
+		logfile.write("{0}\n".format(timestampedmessage))
+# --> Heat data type detection
+def parseheatdatatype(heatfile):
+	with open(heatfile, "r") as fp:
+		for line in fp:
+			tagstart = line.find(heattagstart)
+			tagend = line.find(heattagend)
+			if line.startswith(heatcommentline) and tagstart >= 0 and tagend >= 0:
+				datatype = line[tagstart + len(heattagstart):tagend]
+				if datatype not in heatdatatypes:
+					raise ValueError("Could not recognize heat data type of file {0}: {1}".format(heatfile, datatype))
+				return datatype
+	raise ValueError("Could not find heat data type identifier in file: {0}".format(heatfile))
+# --> Cache handling
+def getcachekey(heatfile):
+	# The key only depends on the content, i.e. moved or copied heat files still hit the cache
+	sha = hashlib.sha1()
+	with open(heatfile, "rb") as fp:
+		for block in iter(lambda: fp.read(1 << 20), b""):
+			sha.update(block)
+	return sha.hexdigest()
+def getcachefile(cachedir, heatfile):
+	key = getcachekey(heatfile)
+	cached = glob.glob(os.path.join(cachedir, "{0}-*{1}".format(key, cachefileextension)))
+	return (key, cached[0] if len(cached) > 0 else None)
+def getcacheddatatype(cachefile):
+	return os.path.basename(cachefile)[:-len(cachefileextension)].split("-", 1)[1]
+def getcachedkey(cachefile):
+	return os.path.basename(cachefile).split("-", 1)[0]
+# Remembers the key last seen per heat file and removes the entries no existing heat file refers to anymore
+def updatecacheindex(cachedir, entries):
+	indexfile = os.path.join(cachedir, cacheindexfilename)
+	index = {}
+	if os.path.isfile(indexfile):
+		try:
+			with open(indexfile, "r") as fp:
+				index = json.load(fp)
+		except ValueError:
+			index = {}
+	knownkeys = set(index.values())
+	# Forget heat files that were deleted - a moved file keeps its entry alive via its new path
+	index = dict((heatfile, key) for heatfile, key in index.items() if os.path.isfile(heatfile))
+	index.update(entries)
+	removed = 0
+	for key in knownkeys - set(index.values()):
+		for cachefile in glob.glob(os.path.join(cachedir, "{0}-*{1}".format(key, cachefileextension))):
+			os.remove(cachefile)
+			removed += 1
+	# Write to a temporary file first to never leave a truncated index behind
+	tmpfile = "{0}.{1}.tmp".format(indexfile, os.getpid())
+	with open(tmpfile, "w") as fp:
+		json.dump(index, fp)
+	if os.path.isfile(indexfile):
+		os.remove(indexfile)
+	os.rename(tmpfile, indexfile)
+	return removed
+# Parses a heat file once and stores it as a binary array of the form (tier, x, y, values ...)
+def cacheheatfile(arg):
+	heatfile = arg[0]
+	cachedir = arg[1]
+	key, cachefile = getcachefile(cachedir, heatfile)
+	if cachefile is not None:
+		return (heatfile, cachefile, False)
+	datatype = parseheatdatatype(heatfile)
+	columns, valuenames = heatdatatypes[datatype]
+	data = numpy.loadtxt(heatfile, delimiter=heatdelimiter, comments=heatcommentline, usecols=columns, ndmin=2)
+	if datatype == "PolledLocation":
+		# Every snapshot counts as exactly one robot seen at the position
+		data = numpy.hstack((data, numpy.ones((data.shape[0], 1))))
+	cachefile = os.path.join(cachedir, "{0}-{1}{2}".format(key, datatype, cachefileextension))
+	# Write to a temporary file first to never expose a partially written cache entry
+	tmpfile = "{0}.{1}.tmp".format(cachefile, os.getpid())
+	with open(tmpfile, "wb") as fp:
+		numpy.save(fp, data)
+	if os.path.isfile(cachefile):
+		os.remove(tmpfile)
+	else:
+		os.rename(tmpfile, cachefile)
+	return (heatfile, cachefile, True)
+# --> Grid handling
+def getextent(cachefile):
+	data = numpy.load(cachefile, mmap_mode="r")
+	if data.shape[0] == 0:
+		return None
+	return (int(data[:, 0].max()), float(data[:, 1].min()), float(data[:, 1].max()), float(data[:, 2].min()), float(data[:, 2].max()))
+# Heat files do not name their layout - a run is assumed to share the layout of the others if it has the most common tier count
+# and its bounding box differs from the median one by at most a tile plus the given share of the layout's length
+global layouttolerance
+layouttolerance = 0.1
+def findlayoutmismatches(extents, tilelength):
+	present = [e for e in extents if e is not None]
+	tiercounts = [e[0] for e in present]
+	tiers = max(set(tiercounts), key=tiercounts.count)
+	bounds = [float(numpy.median([e[j] for e in present])) for j in range(1, 5)]
+	tolerances = [tilelength + layouttolerance * (bounds[1] - bounds[0])] * 2 + [tilelength + layouttolerance * (bounds[3] - bounds[2])] * 2
+	return [i for i in range(0, len(extents)) if extents[i] is not None and (
+		extents[i][0] != tiers or any(abs(extents[i][j + 1] - bounds[j]) > tolerances[j] for j in range(0, 4)))]
+# Builds one grid covering all runs, i.e. the same tile always refers to the same location of the layout
+def buildgrid(extents, tilelength):
+	extents = [e for e in extents if e is not None]
+	if len(extents) == 0:
+		raise ValueError("None of the heat files contains any datapoint")
+	tiers = max(e[0] for e in extents) + 1
+	originx = numpy.floor(min(e[1] for e in extents) / tilelength) * tilelength
+	originy = numpy.floor(min(e[3] for e in extents) / tilelength) * tilelength
+	tilesx = int(numpy.floor((max(e[2] for e in extents) - originx) / tilelength)) + 1
+	tilesy = int(numpy.floor((max(e[4] for e in extents) - originy) / tilelength)) + 1
+	return (tiers, tilesy, tilesx, originx, originy, tilelength)
+# Sums up the values of one run per tile and writes the result to its slice of the memory-mapped stack
+def binrun(arg):
+	cachefile = arg[0]
+	valueindex = arg[1]
+	grid = arg[2]
+	stackfile = arg[3]
+	runcount = arg[4]
+	runindex = arg[5]
+	tiers, tilesy, tilesx, originx, originy, tilelength = grid
+	data = numpy.load(cachefile, mmap_mode="r")
+	tier = data[:, 0].astype(numpy.int64)
+	tilex = numpy.floor((data[:, 1] - originx) / tilelength).astype(numpy.int64)
+	tiley = numpy.floor((data[:, 2] - originy) / tilelength).astype(numpy.int64)
+	flatindex = (tier * tilesy + tiley) * tilesx + tilex
+	binned = numpy.bincount(flatindex, weights=data[:, 3 + valueindex], minlength=tiers * tilesy * tilesx)
+	stack = numpy.memmap(stackfile, dtype=numpy.float64, mode="r+", shape=(runcount, tiers, tilesy, tilesx))
+	stack[runindex] = binned.reshape((tiers, tilesy, tilesx))
+	stack.flush()
+	del stack
+	return runindex
+# Bins all given runs in parallel and returns the memory-mapped stack of shape (runs, tiers, tilesy, tilesx)
+def stackruns(pool, cachefiles, valueindex, grid, cachedir, name):
+	tiers, tilesy, tilesx = grid[0], grid[1], grid[2]
+	stackfile = os.path.join(cachedir, "{0}-{1}{2}".format(name, os.getpid(), stackfileextension))
+	stack = numpy.memmap(stackfile, dtype=numpy.float64, mode="w+", shape=(len(cachefiles), tiers, tilesy, tilesx))
+	del stack
+	pool.map(binrun, [(cachefiles[i], valueindex, grid, stackfile, len(cachefiles), i) for i in range(0, len(cachefiles))])
+	return (stackfile, numpy.memmap(stackfile, dtype=numpy.float64, mode="r", shape=(len(cachefiles), tiers, tilesy, tilesx)))
+# --> Output
+def writeheatgrid(outputfile, grid, values, valuename):
+	tiers, tilesy, tilesx, originx, originy, tilelength = grid
+	tier, tiley, tilex = numpy.indices((tiers, tilesy, tilesx))
+	columns = numpy.column_stack((
+		tier.ravel(),
+		originx + (tilex.ravel() + 0.5) * tilelength,
+		originy + (tiley.ravel() + 0.5) * tilelength,
+		values.ravel()))
+	numpy.savetxt(outputfile, columns, fmt=["%d", "%.4f", "%.4f", "%.6f"], delimiter=heatdelimiter, comments=heatcommentline,
+		header=heatdelimiter.join(["Tier", "X", "Y", valuename]))
+
+if __name__ == "__main__":
+	if len(sys.argv) != 8 and len(sys.argv) != 9:
+		print("Usage: ./heat_aggregator.py <operation: mean, median, q<percent>, diff> <sub data, e.g. Overall> <tile length> <cache dir> <output file> <processCount> <heat file pattern> [<second heat file pattern - diff: mean of second minus mean of first>]")
+		sys.exit(1)
+
+	if os.path.isfile(logfilename):
+		os.remove(logfilename)
+	log(">>> Starting heat aggregation")
+
+	# Get input information
+	operation = sys.argv[1] # the reduction to apply across the runs
+	subdata = sys.argv[2] # the name of the heat sub data to aggregate
+	tilelength = float(sys.argv[3]) # the length of a tile of the common grid
+	cachedir = sys.argv[4] # the directory storing the parsed heat files and the intermediate stacks
+	outputfile = sys.argv[5] # the file to write the aggregated heat grid to
+	processcount = int(sys.argv[6]) # the number of processes used for parsing and binning
+	patterns = sys.argv[7:] # the patterns identifying the heat files of the runs (one per group)
+	if operation == "diff" and len(patterns) != 2:
+		print("The diff operation needs exactly two heat file patterns")
+		sys.exit(1)
+	if operation != "diff" and len(patterns) != 1:
+		print("The {0} operation needs exactly one heat file pattern".format(operation))
+		sys.exit(1)
+	quantile = None
+	if operation == "median":
+		quantile = 50.0
+	elif operation.startswith("q"):
+		try:
+			quantile = float(operation[1:])
+		except ValueError:
+			quantile = None
+		if quantile is None or not 0 <= quantile <= 100:
+			print("The quantile has to be a number within 0..100: {0}".format(operation))
+			sys.exit(1)
+	elif operation != "mean" and operation != "diff":
+		print("Unknown operation: {0}".format(operation))
+		sys.exit(1)
+	if not os.path.isdir(cachedir):
+		os.makedirs(cachedir)
+
+	# Find the heat files of all groups
+	groups = []
+	for pattern in patterns:
+		heatfiles = sorted(os.path.abspath(path) for path in glob.glob(pattern))
+		log("Found {0} heat files for pattern {1}".format(len(heatfiles), pattern))
+		if len(heatfiles) == 0:
+			print("No heat files found for pattern: {0}".format(pattern))
+			sys.exit(1)
+		groups.append(heatfiles)
+
+	pool = multiprocessing.Pool(processcount)
+
+	# Parse all heat files not yet contained in the cache
+	log("Parsing heat files ...")
+	cachedgroups = []
+	for heatfiles in groups:
+		results = pool.map(cacheheatfile, [(heatfile, cachedir) for heatfile in heatfiles])
+		log("Parsed {0} heat files ({1} taken from cache)".format(len(results), len([r for r in results if not r[2]])))
+		cachedgroups.append([r[1] for r in results])
+
+	# Drop the cache entries of heat files that were rewritten since they were parsed
+	removed = updatecacheindex(cachedir, [(heatfile, getcachedkey(cachefile)) for heatfiles, cachefiles in zip(groups, cachedgroups) for heatfile, cachefile in zip(heatfiles, cachefiles)])
+	log("Removed {0} superseded cache entries".format(removed))
+
+	# Make sure all runs contain the same kind of data
+	datatypes = set(getcacheddatatype(cachefile) for cachefiles in cachedgroups for cachefile in cachefiles)
+	if len(datatypes) != 1:
+		print("Cannot aggregate different heat data types: {0}".format(",".join(sorted(datatypes))))
+		sys.exit(1)
+	datatype = datatypes.pop()
+	valuenames = heatdatatypes[datatype][1]
+	if subdata not in valuenames:
+		print("Unknown sub data {0} for heat data type {1} - choose one of: {2}".format(subdata, datatype, ",".join(valuenames)))
+		sys.exit(1)
+	valueindex = valuenames.index(subdata)
+
+	# Build the common grid of all runs
+	log("Building common grid ...")
+	extents = pool.map(getextent, [cachefile for cachefiles in cachedgroups for cachefile in cachefiles])
+	if all(e is None for e in extents):
+		print("None of the heat files contains any datapoint")
+		sys.exit(1)
+	mismatches = findlayoutmismatches(extents, tilelength)
+	if len(mismatches) > 0:
+		heatfiles = [heatfile for heatfiles in groups for heatfile in heatfiles]
+		print("Cannot aggregate runs of different layouts - the tiers or extents of these heat files differ from the others:")
+		for i in mismatches:
+			print("{0} (tiers: {1}, x: {2}..{3}, y: {4}..{5})".format(heatfiles[i], extents[i][0] + 1, extents[i][1], extents[i][2], extents[i][3], extents[i][4]))
+		sys.exit(1)
+	grid = buildgrid(extents, tilelength)
+	log("Grid has {0} tiers with {1}x{2} tiles of length {3}".format(grid[0], grid[2], grid[1], tilelength))
+
+	# Bin the runs and reduce them
+	log("Binning runs ...")
+	stacks = [stackruns(pool, cachedgroups[i], valueindex, grid, cachedir, "group{0}".format(i)) for i in range(0, len(cachedgroups))]
+	pool.close()
+	pool.join()
+	log("Reducing {0} runs by {1} ...".format(sum(len(cachefiles) for cachefiles in cachedgroups), operation))
+	if operation == "diff":
+		values = stacks[1][1].mean(axis=0) - stacks[0][1].mean(axis=0)
+	elif quantile is not None:
+		values = numpy.percentile(stacks[0][1], quantile, axis=0)
+	else:
+		values = stacks[0][1].mean(axis=0)
+
+	# Write the result and clean up the intermediate stacks
+	log("Writing result to {0} ...".format(outputfile))
+	writeheatgrid(outputfile, grid, values, "{0}-{1}".format(subdata, operation))
+	stackfiles = [stackfile for stackfile, stack in stacks]
+	del stacks
+	for stackfile in stackfiles:
+		os.remove(stackfile)
+
+	# Finish
+	log(".Fin.")